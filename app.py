@@ -1,6 +1,5 @@
 import asyncio
 from board import Board
-import json
 from server import Server
 from display import Display
 from wifi import WifiConnection
@@ -21,20 +20,28 @@ class App:
         self.display = Display()
         self.server = Server(self.board)
         self.button_left = Button(LEFT_BUTTON_PIN, self._left_button_press)
-        self.button_main = Button(MAIN_BUTTON_PIN, self._main_button_press)
+        self.button_main = Button(MAIN_BUTTON_PIN, self._main_button_press, self._main_button_long_press)
         self.button_right = Button(RIGHT_BUTTON_PIN, self._right_button_press)
         self.mode = self.MODE_MENU
         self.game = Game(self.display, self.board)
         
         if D_TIMINGS:
-            self.last_loop_start = 0
+            self.last_loop_start = time.ticks_ms()
             async def loop_measure():
-                """Measure the duration of the main loop."""
+                """Measure the duration of the main loop and report the worst case every second."""
+                worst = 0
+                last_report = self.last_loop_start
                 while True:
                     last = self.last_loop_start
                     now = time.ticks_ms()
                     self.last_loop_start = now
-                    print(time.ticks_diff(now, last), end='l ')
+                    lag = time.ticks_diff(now, last)
+                    print(lag, end='l ')
+                    worst = max(worst, lag)
+                    if time.ticks_diff(now, last_report) >= 1000:
+                        print(worst, end='L\n') # worst-case event loop lag in the last second
+                        worst = 0
+                        last_report = now
                     await asyncio.sleep(0)
             asyncio.create_task(loop_measure())
         
@@ -46,11 +53,12 @@ class App:
             allocated = gc.mem_alloc()
             total = free + allocated
             print(f"Memory: {allocated}/{total} ({allocated / total * 100}%) allocated, {free} free")
+            print(f"Live clients: {len(self.server.clients)}, {self.server.reaped_clients} reaped for not answering pings")
 
         @self.display.add_menu_item("Enter game")
         def enter_game():
             self.mode = self.MODE_GAME
-            self.game.drawLcd()
+            self.game.enter()
 
         @self.display.add_menu_item("Connect to WiFi")
         def set_client_mode():
@@ -69,12 +77,9 @@ class App:
             self.display.show_splash(mode, ip or "Error")
 
 
-        @self.board.stone_update
-        async def stone_update(i, j, previous_stone, new_stone):
-            await self.server.send_to_all(json.dumps({
-                'type': 'stone_update',
-                'x': i, 'y': j, 'stone': new_stone
-            }))
+        @self.board.stone_update_batch
+        async def stone_update(changes):
+            self.server.queue_changes(changes)
 
     def _left_button_press(self):
         if self.mode == self.MODE_MENU:
@@ -94,6 +99,13 @@ class App:
         elif self.mode == self.MODE_GAME:
             self.game.button2()
 
+    def _main_button_long_press(self):
+        # go back to the menu, from any mode
+        if self.mode == self.MODE_GAME:
+            self.game.leave()
+        self.mode = self.MODE_MENU
+        self.display.show_menu()
+
     async def main(self):
         # Create tasks to run concurrently
         server_task = asyncio.create_task(self.server.start())
@@ -0,0 +1,90 @@
+"""Micro-benchmark of Microdot route resolution with the routes of Server.
+
+Compares the indexed Microdot.find_route with the previous linear scan over
+url_map, and checks that both resolve every path to the same handler. Runs on
+CPython or MicroPython from the repository root:
+
+    python benchmarks/bench_routes.py
+"""
+import sys
+import time
+
+sys.path.insert(0, '.')
+from microdot import Microdot  # noqa: E402
+
+ROUNDS = 2000
+PATHS = ['/', '/live', '/config', '/configDefault', '/reset', '/style.css',
+         '/config.html', '/favicon.ico', '/missing/file.txt']
+
+
+def handler(request, **kwargs):
+    pass
+
+
+def make_app():
+    # same routes, in the same order, as Server.__init__
+    app = Microdot()
+    app.route('/live')(handler)
+    app.route('/config', methods=['GET'])(handler)
+    app.route('/configDefault', methods=['GET'])(handler)
+    app.route('/config', methods=['POST'])(handler)
+    app.route('/reset')(handler)
+    app.route('/')(handler)
+    app.route('/<path:path>')(handler)
+    return app
+
+
+class FakeRequest:
+    def __init__(self, path):
+        self.method = 'GET'
+        self.path = path
+        self.url_args = None
+
+
+def linear_find_route(app, req):
+    """Route resolution before the route index was added."""
+    f = 404
+    for route_methods, route_pattern, route_handler, _, _ in app.url_map:
+        req.url_args = route_pattern.match(req.path)
+        if req.url_args is not None:
+            if req.method in route_methods:
+                f = route_handler
+                break
+            else:
+                f = 405
+    return f
+
+
+def indexed_find_route(app, req):
+    return app.find_route(req)[0]
+
+
+def ticks_us():
+    if hasattr(time, 'ticks_us'):  # pragma: no cover
+        return time.ticks_us()
+    return int(time.perf_counter() * 1000000)
+
+
+def bench(name, find_route, app):
+    requests = [FakeRequest(path) for path in PATHS]
+    start = ticks_us()
+    for _ in range(ROUNDS):
+        for req in requests:
+            find_route(app, req)
+    elapsed = ticks_us() - start
+    print('{name}: {us:.2f} us per lookup'.format(
+        name=name, us=elapsed / (ROUNDS * len(requests))))
+
+
+def main():
+    app = make_app()
+    for path in PATHS:
+        linear_req, indexed_req = FakeRequest(path), FakeRequest(path)
+        assert linear_find_route(app, linear_req) == \
+            indexed_find_route(app, indexed_req), path
+        assert linear_req.url_args == indexed_req.url_args, path
+    bench('linear', linear_find_route, app)
+    bench('indexed', indexed_find_route, app)
+
+
+main()
@@ -0,0 +1,60 @@
+"""Benchmark of the heap allocated by WebSocket.send for one message.
+
+Compares the current send path (header in a reusable per-connection buffer,
+payload written without copying) with the previous one, which encoded the
+whole frame into a new bytearray. Runs on CPython from the repository root
+(it uses tracemalloc):
+
+    python benchmarks/bench_ws_send.py
+"""
+import asyncio
+import sys
+import tracemalloc
+
+sys.path.insert(0, '.')
+from microdot.websocket import WebSocket  # noqa: E402
+
+SIZES = [60, 1500, 8 * 1024, 64 * 1024]
+
+
+class NullStream:
+    """Output stream that discards the data, like a socket that sent it."""
+    async def awrite(self, data):
+        pass
+
+
+class FakeRequest:
+    sock = (None, NullStream())
+
+
+async def old_send(ws, data):
+    """WebSocket.send before the zero-copy send path was added."""
+    frame = ws._encode_websocket_frame(ws.BINARY, data)
+    await ws.request.sock[1].awrite(frame)
+
+
+async def new_send(ws, data):
+    await ws.send(data)
+
+
+async def peak_allocation(send, ws, data):
+    await send(ws, data)  # warm up
+    tracemalloc.reset_peak()
+    start = tracemalloc.get_traced_memory()[0]
+    await send(ws, data)
+    return tracemalloc.get_traced_memory()[1] - start
+
+
+async def main():
+    ws = WebSocket(FakeRequest())
+    tracemalloc.start()
+    print('payload bytes | old peak | new peak (bytes allocated per send)')
+    for size in SIZES:
+        data = bytes(size)
+        old = await peak_allocation(old_send, ws, data)
+        new = await peak_allocation(new_send, ws, data)
+        print('{:>13} | {:>8} | {:>8}'.format(size, old, new))
+    tracemalloc.stop()
+
+
+asyncio.run(main())
@@ -1,16 +1,19 @@
 from machine import ADC, Pin
 import uasyncio as asyncio
 from config import O, E, S0, S1, S2, S3, M0, M1, M2, M3, BLACK_THRESHOLD, WHITE_THRESHOLD, ROTATION, FLIP, D_TIMINGS
+from config import SCAN_ROWS_PER_YIELD, SCAN_BUDGET_US, BLACK_RELEASE_THRESHOLD, WHITE_RELEASE_THRESHOLD, STONE_CONFIRM_SCANS
+from array import array
 import time
 import rp2
 import micropython
+from board_state import BoardState, EMPTY, BLACK, WHITE, STONE_CHARS
+from ring_buffer import RingBuffer
 
 class Board:
 	def __init__(self):
-		# matrices
-		self.number_matrix = [[31800]*15 for _ in range(15)]
-		self.calibration_matrix = [[31800]*15 for _ in range(15)]
-		self.stone_matrix = [[' ']*15 for _ in range(15)]
+		# readings and stones
+		self.state = BoardState()
+		self._next_numbers = array('h', [0] * BoardState.CELLS) # back buffer filled by the running sweep
 
 		self.O = ADC(Pin(O)) # output pin
 		self.E = E # enable pin, not used
@@ -32,7 +35,9 @@ class Board:
 		
 		# Stone change observers
 		self.stone_observers = []
-		self.changed_stones = []
+		self.batch_observers = []
+		# Changes of the last sweep packed as index << 4 | previous << 2 | new (see _pop_changes)
+		self.changed_stones = RingBuffer(BoardState.CELLS)
 
 
 		self.GRAY_CODE_S = [  # write value to S and the output is index j
@@ -47,59 +52,167 @@ class Board:
 			(0b1101, self.M0, 1), (0b1111, self.M1, 1),	(0b1110, self.M0, 0), (0b1010, self.M2, 0),
 			(0b1011, self.M0, 1), (0b1001, self.M1, 0),	(0b1000, self.M0, 0), (0b0000, self.M3, 0),
 		]
+		self.build_scan_plan()
 
 
 	
-	@micropython.native
-	def update_matrix(self, calibrate=False):
-		"""Read the current values from the board and update the number_matrix."""
-		# Reset all mux to 0
-		for mux in [self.M0, self.M1, self.M2, self.M3, self.S0, self.S1, self.S2, self.S3]:
-			mux.value(0)
+	def build_scan_plan(self, rotation=ROTATION, flip=FLIP):
+		"""Precompute the flat sequence of (pin toggle, cell index) steps of one sweep.
 
-		for i, S, value in self.GRAY_CODE_S:
-			# set value and ensure not out of range
-			S.value(value)
-			if i >= 15:
+		Each step toggles a single mux pin; steps that select a board cell carry its
+		flat index in BoardState (already adjusted for rotation and flip), the others
+		carry -1. Steps are grouped into rows (one individual mux setting each) whose
+		(start, end) ranges are stored in scan_rows. Call again whenever the orientation
+		changes.
+		"""
+		plan = []
+		rows = []
+		for i, S, s_value in self.GRAY_CODE_S:
+			start = len(plan)
+			plan.append((S.on if s_value else S.off, -1))
+			if i >= 15: # the whole row is out of range, the main mux does not need to cycle
+				rows.append((start, len(plan)))
 				continue
 
-			for j, M, value in self.GRAY_CODE_M:
-				# set value and ensure not out of range
-				M.value(value)
+			for j, M, m_value in self.GRAY_CODE_M:
+				toggle = M.on if m_value else M.off
 				if j >= 15:
+					plan.append((toggle, -1))
 					continue
 
 				# Based on rotation and flip, adjust the indices
-				if ROTATION == 0:
+				if rotation == 0:
 					x, y = 14 - i, 14 - j
-				elif ROTATION == 1:
+				elif rotation == 1:
 					x, y = j, 14 - i
-				elif ROTATION == 2:
+				elif rotation == 2:
 					x, y = i, j
-				elif ROTATION == 3:
+				elif rotation == 3:
 					x, y = 14 - j, i
-				if FLIP:
+				if flip:
 					x, y = 14 - x, y
-				
-				# Read the value from the ADC and correct it with the calibration matrix
-				if calibrate:
-					self.calibration_matrix[x][y] = self.O.read_u16()
-				else:
-					self.number_matrix[x][y] = self.O.read_u16() - self.calibration_matrix[x][y] # 30 us
-
-				# Calculate the stone type based on corrected values
-				previous_stone = self.stone_matrix[x][y]
-				if self.number_matrix[x][y] > BLACK_THRESHOLD:
-					self.stone_matrix[x][y] = 'B'
-				elif self.number_matrix[x][y] < -WHITE_THRESHOLD:
-					self.stone_matrix[x][y] = 'W'
-				else:
-					self.stone_matrix[x][y] = ' '
-
-				# Notify observers if the stone has changed
-				if previous_stone != self.stone_matrix[x][y]:
-					self.changed_stones.append((x, y, previous_stone, self.stone_matrix[x][y]))
+				plan.append((toggle, BoardState.index(x, y)))
+			rows.append((start, len(plan)))
+		self.scan_plan = plan
+		self.scan_rows = rows
+
+	def _reset_mux(self):
+		for mux in [self.M0, self.M1, self.M2, self.M3, self.S0, self.S1, self.S2, self.S3]:
+			mux.value(0)
+
+	@micropython.native
+	def _scan_steps(self, start, end, calibrate=False):
+		"""Run the scan plan steps in range(start, end), storing into the back buffer
+		(or into the calibration values when calibrating)."""
+		plan = self.scan_plan
+		read = self.O.read_u16
+		calibration = self.state.calibration
+		if calibrate:
+			for k in range(start, end):
+				toggle, i = plan[k]
+				toggle()
+				if i >= 0:
+					calibration[i] = read()
+			return
+
+		numbers = self._next_numbers
+		for k in range(start, end):
+			toggle, i = plan[k]
+			toggle()
+			if i >= 0:
+				value = read() - calibration[i] # 30 us
+				if value > 32767: # clamp to the signed 16-bit storage
+					value = 32767
+				elif value < -32768:
+					value = -32768
+				numbers[i] = value
+
+	def _finish_sweep(self):
+		"""Publish the completed back buffer and update the stones from it."""
+		state = self.state
+		state.numbers, self._next_numbers = self._next_numbers, state.numbers
+		self._update_stones()
+
+	def update_matrix(self, calibrate=False):
+		"""Read the current values from the board and update the readings and stones in one go."""
+		self._reset_mux()
+		self._scan_steps(0, len(self.scan_plan), calibrate)
+		if not calibrate:
+			self._finish_sweep()
+
+	async def scan(self):
+		"""Read the board like update_matrix, yielding to other tasks every SCAN_ROWS_PER_YIELD
+		rows or SCAN_BUDGET_US microseconds (0 disables the limit). Readings and stones are
+		only published once the sweep is complete, so observers never see a partial board."""
+		self._reset_mux()
+		rows = 0
+		t0 = time.ticks_us()
+		for start, end in self.scan_rows:
+			self._scan_steps(start, end)
+			rows += 1
+			if (SCAN_ROWS_PER_YIELD and rows >= SCAN_ROWS_PER_YIELD) or \
+					(SCAN_BUDGET_US and time.ticks_diff(time.ticks_us(), t0) >= SCAN_BUDGET_US):
+				await asyncio.sleep_ms(0)
+				rows = 0
+				t0 = time.ticks_us()
+		self._finish_sweep()
+
+	@micropython.native
+	def _update_stones(self):
+		"""Calculate the stone type of every cell based on corrected values.
+
+		A stone is placed once the reading crosses BLACK_THRESHOLD/WHITE_THRESHOLD and
+		only removed once it falls back over the (lower) release threshold. A new
+		state must also hold for STONE_CONFIRM_SCANS consecutive sweeps before it is
+		accepted, so hovering hands and sliding stones do not produce bursts of changes.
+		"""
+		black_threshold = BLACK_THRESHOLD
+		white_threshold = -WHITE_THRESHOLD
+		black_release = BLACK_RELEASE_THRESHOLD
+		white_release = -WHITE_RELEASE_THRESHOLD
+		confirm_scans = STONE_CONFIRM_SCANS
+		changed_stones = self.changed_stones
+		numbers = self.state.numbers
+		stones = self.state.stones
+		pending = self.state.pending
+		counts = self.state.counts
+		for i in range(BoardState.CELLS):
+			value = numbers[i]
+			previous_stone = stones[i]
+			if previous_stone == BLACK and value > black_release:
+				stone = BLACK
+			elif previous_stone == WHITE and value < white_release:
+				stone = WHITE
+			elif value > black_threshold:
+				stone = BLACK
+			elif value < white_threshold:
+				stone = WHITE
+			else:
+				stone = EMPTY
+
+			if stone == previous_stone:
+				counts[i] = 0
+				continue
+
+			# Count consecutive sweeps with the same new state
+			if pending[i] != stone:
+				pending[i] = stone
+				counts[i] = 1
+			else:
+				counts[i] += 1
+			if counts[i] < confirm_scans:
+				continue
+
+			# Notify observers if the stone has changed
+			stones[i] = stone
+			counts[i] = 0
+			changed_stones.push(i << 4 | previous_stone << 2 | stone)
 	
+	@property
+	def stone_matrix(self):
+		"""Snapshot of the stones as a 15x15 list of lists of ' ', 'B' and 'W'."""
+		return self.state.stone_rows()
+
 	def calibrate(self):
 		"""Calibrate the board by reading the current values and setting them as calibration values."""
 		self.update_matrix(calibrate=True)
@@ -123,19 +236,31 @@ class Board:
 		self.monitoring = True
 		while self.monitoring:
 			t0 = time.ticks_us()
-			self.update_matrix()
+			await self.scan()
 			t1 = time.ticks_us()
 			if D_TIMINGS:
 				print(time.ticks_diff(t1, t0), end='m ')
 			
 			# Notify observers about changed stones
-			while self.changed_stones:
-				x, y, previous_stone, new_stone = self.changed_stones.pop(0)
-				for observer in self.stone_observers:
-					await observer(x, y, previous_stone, new_stone)
+			if self.changed_stones:
+				changes = self._pop_changes()
+				for observer in self.batch_observers:
+					await observer(changes)
+				for x, y, previous_stone, new_stone in changes:
+					for observer in self.stone_observers:
+						await observer(x, y, previous_stone, new_stone)
 
 			await asyncio.sleep_ms(interval_ms)
 	
+	def _pop_changes(self):
+		"""Empty the change queue into a list of (x, y, previous_stone, new_stone) tuples."""
+		changes = []
+		while self.changed_stones:
+			record = self.changed_stones.pop()
+			i = record >> 4
+			changes.append((i // BoardState.SIZE, i % BoardState.SIZE, STONE_CHARS[(record >> 2) & 3], STONE_CHARS[record & 3]))
+		return changes
+
 	def stop_monitoring(self):
 		self.monitoring = False
 	
@@ -144,10 +269,25 @@ class Board:
 		Decorator to register a function as a stone change listener.
 		Example usage:
 		
-		@board.stone_change_listener
-		def on_stone_changed(row, col, old_stone, new_stone):
+		@board.stone_update
+		async def on_stone_changed(row, col, old_stone, new_stone):
 			print(f"Stone at {row},{col} changed from {old_stone} to {new_stone}")
 		"""
 		if callback not in self.stone_observers:
 			self.stone_observers.append(callback)
 		return callback
+
+	def stone_update_batch(self, callback):
+		"""
+		Decorator to register a function receiving all changes of one sweep at once,
+		as a list of (row, col, old_stone, new_stone) tuples. Batch listeners are
+		called before the per-change stone_update listeners.
+		Example usage:
+
+		@board.stone_update_batch
+		async def on_stones_changed(changes):
+			print(f"{len(changes)} stones changed")
+		"""
+		if callback not in self.batch_observers:
+			self.batch_observers.append(callback)
+		return callback
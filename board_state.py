@@ -0,0 +1,41 @@
+from array import array
+
+# Stone codes stored in BoardState.stones
+EMPTY = 0
+BLACK = 1
+WHITE = 2
+STONE_CHARS = ' BW' # STONE_CHARS[code] is the character used by observers and clients
+
+class BoardState:
+	"""Compact storage of the board readings and stones.
+
+	All cells are kept in flat arrays indexed by `x * SIZE + y`:
+	- `calibration`: raw ADC readings of the empty board (array of unsigned 16-bit)
+	- `numbers`: calibrated readings, clamped to signed 16-bit
+	- `stones`: stone codes (EMPTY, BLACK or WHITE)
+	- `pending`, `counts`: stone code seen in the last sweeps that differs from
+	  `stones`, and for how many consecutive sweeps it has been seen
+	"""
+	SIZE = 15
+	CELLS = SIZE * SIZE
+
+	def __init__(self):
+		self.calibration = array('H', [31800] * self.CELLS)
+		self.numbers = array('h', [0] * self.CELLS)
+		self.stones = bytearray(self.CELLS)
+		self.pending = bytearray(self.CELLS)
+		self.counts = bytearray(self.CELLS)
+
+	@staticmethod
+	def index(x, y):
+		return x * BoardState.SIZE + y
+
+	def stone(self, x, y):
+		"""Return the stone character at the given coordinates."""
+		return STONE_CHARS[self.stones[x * self.SIZE + y]]
+
+	def stone_rows(self):
+		"""Return the stones as a new 15x15 list of lists of characters (e.g. for JSON)."""
+		size = self.SIZE
+		stones = self.stones
+		return [[STONE_CHARS[stones[x * size + y]] for y in range(size)] for x in range(size)]
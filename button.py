@@ -1,30 +1,90 @@
-from config import DEBOUNCE_TIME
+from config import DEBOUNCE_TIME, LONG_PRESS_TIME
 from machine import Pin
-from time import ticks_ms, ticks_diff
+from time import ticks_ms, ticks_diff, ticks_add
 import asyncio
 
 class Button:
-	def __init__(self, pin_id, callback = lambda: None):
+	"""A button that pulls its pin low when pressed.
+
+	Pin edges wake the button's task through an interrupt and a ThreadSafeFlag;
+	where pin interrupts are not available the task polls the pin instead. A
+	change is accepted only DEBOUNCE_TIME ms after the previous one.
+
+	`callback` runs when the button is pressed. If the button has a
+	`long_callback`, it runs on release instead, and not at all if the press was
+	held for LONG_PRESS_TIME ms, which runs `long_callback`.
+	"""
+	POLL_INTERVAL = 10 # milliseconds, without pin interrupts
+
+	def __init__(self, pin_id, callback = lambda: None, long_callback = None):
 		self.pin = Pin(pin_id, Pin.IN, Pin.PULL_UP)
-		self._last_press = ticks_ms()
 		self.callback = callback
+		self.long_callback = long_callback
+		self.pressed = False # debounced state
+		self._changed_at = ticks_add(ticks_ms(), -DEBOUNCE_TIME) # time of the last accepted change
+		self._consumed = False # the current press already ran the long press callback
+		try:
+			self._flag = asyncio.ThreadSafeFlag()
+			self.pin.irq(self._irq, Pin.IRQ_FALLING | Pin.IRQ_RISING)
+		except (AttributeError, ValueError, OSError):
+			self._flag = None # poll
 		asyncio.create_task(self._loop()) # Start the asynchronous loop
-		self.has_been_released = True # Used in case asyncio caused too large delay
+
+	def _irq(self, pin):
+		self._flag.set()
+
+	def _timeout(self, now):
+		"""Return the milliseconds until the state must be checked again without a pin edge, or None."""
+		since_change = ticks_diff(now, self._changed_at)
+		timeout = None
+		if since_change < DEBOUNCE_TIME:
+			# edges during the debounce time are ignored, so read the settled pin after it
+			timeout = DEBOUNCE_TIME - since_change
+		if self.pressed and self.long_callback and not self._consumed:
+			hold = max(LONG_PRESS_TIME - since_change, 0)
+			timeout = hold if timeout is None else min(timeout, hold)
+		return timeout
 
 	async def _loop(self):
-		"""Asynchronous loop to check the button state."""
+		"""Asynchronous loop waiting for pin changes."""
 		while True:
-			if self.pin.value() == 0: # If pressed
-				# Reset last press and calculate difference
-				last = self._last_press
-				self._last_press = ticks_ms()
-				diff_time = ticks_diff(self._last_press, last)
-				if diff_time > DEBOUNCE_TIME and self.has_been_released: # If hasn't been pressed recently
-					self.callback()
-					self.has_been_released = False
+			if self._flag is None:
+				await asyncio.sleep_ms(self.POLL_INTERVAL)
 			else:
-				self.has_been_released = True
-			await asyncio.sleep(0.01) # yield
+				timeout = self._timeout(ticks_ms())
+				if timeout is None:
+					await self._flag.wait()
+				else:
+					try:
+						await asyncio.wait_for_ms(self._flag.wait(), timeout)
+					except asyncio.TimeoutError:
+						pass
+			self._update(ticks_ms())
+
+	def _update(self, now):
+		pressed = self.pin.value() == 0
+		since_change = ticks_diff(now, self._changed_at)
+		if pressed != self.pressed and since_change >= DEBOUNCE_TIME:
+			self.pressed = pressed
+			self._changed_at = now
+			since_change = 0
+			if pressed:
+				self._press()
+			else:
+				self._release()
+		if self.pressed and self.long_callback and not self._consumed and since_change >= LONG_PRESS_TIME:
+			self._consumed = True
+			self.long_callback()
+
+	def _press(self):
+		self._consumed = False
+		if not self.long_callback:
+			self.callback()
+
+	def _release(self):
+		if self.long_callback and not self._consumed:
+			self.callback()
 
 	def set_callback(self, callback):
 		self.callback = callback
+
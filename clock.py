@@ -1,12 +1,11 @@
 import asyncio
 import time
+from time_control import TimeControl
 
 class Clock:
 	PLAYER_1 = 0
 	PLAYER_2 = 1
 
-	observers = set()
-
 	def add_observer(self, observer):
 		self.observers.add(observer)
 
@@ -16,64 +15,101 @@ class Clock:
 
 	def __init__(self):
 		self.running = False
+		self.observers = set()
+		self.wake = asyncio.Event() # set when the running state or turn changes
 		asyncio.create_task(self._async_loop())
 
-	def init_clock(self, time1 = 3 * 60, time2 = 3 * 60, fisher1 = 0, fisher2 = 0):
-		self.fisher1 = fisher1
-		self.fisher2 = fisher2
-
+	def init_clock(self, time1 = 3 * 60, time2 = 3 * 60, fisher1 = 0, fisher2 = 0,
+			delay1 = 0, delay2 = 0, periods1 = 0, periods2 = 0, period_time1 = 0, period_time2 = 0):
+		"""Reset the clock. Times are in seconds: main time, Fischer increment per move,
+		Bronstein delay per move, then the number and length of byo-yomi periods."""
 		self.running = False
 		self.turn = self.PLAYER_1
 		self.win = None
-		self.fisher = [fisher1 * 1000, fisher2 * 1000]
-		self.time_left = [time1 * 1000, time2 * 1000]
+		self.controls = [
+			TimeControl(time1 * 1000, fisher1 * 1000, delay1 * 1000, periods1, period_time1 * 1000),
+			TimeControl(time2 * 1000, fisher2 * 1000, delay2 * 1000, periods2, period_time2 * 1000),
+		]
+		self.time_left = [control.time_left(0) for control in self.controls]
+		self.turn_start = time.ticks_ms() # when the current turn was last started or unpaused
+		self.turn_elapsed = 0 # ms of the current turn before the last pause
+		self.wake.set()
+
+	def _elapsed(self, now):
+		"""Return the ms elapsed in the current turn, from its single reference time."""
+		if not self.running:
+			return self.turn_elapsed
+		return self.turn_elapsed + time.ticks_diff(now, self.turn_start)
+
+	def _next_wakeup(self):
+		"""Return the milliseconds until the displayed time of the running clock changes,
+		a time control boundary is reached or its flag falls."""
+		return self.controls[self.turn].next_wakeup(self._elapsed(time.ticks_ms()))
 
 	async def _async_loop(self):
 		while True:
+			self.wake.clear()
 			if not self.running:
-				await asyncio.sleep(0.1)
+				await self.wake.wait()
 				continue
 
 			self._apply_elapsed()
+			if not self.running: # flag fell
+				continue
 
-			# wait until XX:XX.00
-			sleep_time = self.time_left[self.turn] % 1000 / 1000.0
-
-			await asyncio.sleep(sleep_time)
+			try:
+				await asyncio.wait_for_ms(self.wake.wait(), self._next_wakeup())
+			except asyncio.TimeoutError:
+				pass
 
 	def _apply_elapsed(self):
-		"""Remove elapsed time from the current player's clock. Can be safely called at any time. Must be called before player switch and should be called periodically."""
+		"""Update the current player's time_left and check for flag fall. Can be safely called at any time."""
 		if not self.running:
 			return
 
-		now = time.ticks_ms()
-		elapsed = time.ticks_diff(now, self.last_switch_time)
-		self.last_switch_time = now
-
-		self.time_left[self.turn] -= elapsed
-		if self.time_left[self.turn] < 0:
-			self.time_left[self.turn] = 0
+		elapsed = self._elapsed(time.ticks_ms())
+		control = self.controls[self.turn]
+		self.time_left[self.turn] = control.time_left(elapsed)
+		if control.flagged(elapsed):
+			self.turn_elapsed = elapsed
 			self.win = self.PLAYER_2 if self.turn == self.PLAYER_1 else self.PLAYER_1
 			self.running = False
 			
 		self.send_update()
+
+	def _end_turn(self, next_turn):
+		"""Charge the current player for their turn (with increment if the clock is running) and give the turn to next_turn."""
+		if self.turn != next_turn and self.win is None:
+			now = time.ticks_ms()
+			elapsed = self._elapsed(now)
+			control = self.controls[self.turn]
+			if control.flagged(elapsed):
+				self._apply_elapsed()
+				return
+			control.end_turn(elapsed, moved = self.running)
+			self.time_left[self.turn] = control.time_left(0)
+			self.turn_start = now
+			self.turn_elapsed = 0
+		self.turn = next_turn
+		self.wake.set()
+		self.send_update()
 	
 	def pause(self):
 		self._apply_elapsed()
+		if self.running:
+			self.turn_elapsed = self._elapsed(time.ticks_ms())
 		self.running = False
+		self.wake.set()
 		self.send_update()
 
 	def unpause(self):
+		self.turn_start = time.ticks_ms()
 		self.running = True
-		self.last_switch_time = time.ticks_ms()
+		self.wake.set()
 		self.send_update()
 
 	def button1(self):
-		self._apply_elapsed()
-		self.turn = 1
-		self.send_update()
+		self._end_turn(self.PLAYER_2)
 
 	def button2(self):
-		self._apply_elapsed()
-		self.turn = 0
-		self.send_update()
+		self._end_turn(self.PLAYER_1)
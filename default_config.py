@@ -13,11 +13,17 @@ E = None # Enable pin, not used
 # Board settings
 BLACK_THRESHOLD = 600
 WHITE_THRESHOLD = 600
+BLACK_RELEASE_THRESHOLD = 400 # a placed stone is removed only once the reading falls back below these
+WHITE_RELEASE_THRESHOLD = 400
+STONE_CONFIRM_SCANS = 3 # consecutive sweeps a new stone state must hold before it is reported
 ROTATION = 0 # 0-3 (number of 90° clockwise rotations)
 FLIP = False
+SCAN_ROWS_PER_YIELD = 3 # rows scanned before yielding to other tasks, 0 = no limit
+SCAN_BUDGET_US = 0 # microseconds scanned before yielding to other tasks, 0 = no limit
 
 # Menu buttons
 DEBOUNCE_TIME = 100 # milliseconds
+LONG_PRESS_TIME = 800 # milliseconds a button is held for a long press
 MAIN_BUTTON_PIN = 21
 LEFT_BUTTON_PIN = 14
 RIGHT_BUTTON_PIN = 17
@@ -25,6 +31,7 @@ RIGHT_BUTTON_PIN = 17
 # LCD Pins
 SCL = 19
 SDA = 18
+DISPLAY_MAX_FPS = 10 # screen updates per second, requests in between are merged
 
 # Network settings
 SSID="Your SSID"
@@ -34,6 +41,19 @@ AP_PASSWORD="piskvorky"
 HOSTNAME = 'ECB'
 PREFER_CLIENT = True
 PORT = 80
+HTTP_KEEP_ALIVE_TIMEOUT = 5 # seconds an idle connection is kept open for the next request, 0 = close after every response
+HTTP_MAX_KEEP_ALIVE_REQUESTS = 10 # requests served on one connection before it is closed
+WS_FLUSH_INTERVAL = 100 # milliseconds, stone changes are sent to clients at most this long after detection
+WS_QUEUE_LENGTH = 8 # messages waiting for a slow client before WS_OVERFLOW_POLICY applies
+WS_OVERFLOW_POLICY = 'resync' # 'resync' (replace the backlog with a full board) or 'disconnect'
+WS_HISTORY_LENGTH = 32 # delta messages kept for clients resuming after a reconnect
+WS_PING_INTERVAL = 10 # seconds between pings to websocket clients
+WS_PONG_TIMEOUT = 5 # seconds a client has to answer a ping before it is disconnected
+MAX_WS_CLIENTS = 8 # concurrent live (websocket) clients
+MAX_HTTP_REQUESTS = 4 # HTTP requests handled at once, not counting live clients and idle keep-alive connections
+MIN_FREE_MEMORY = 20 * 1024 # bytes of free heap required to accept a new connection
+STATIC_CACHE_SIZE = 16 * 1024 # bytes of static files kept in RAM
+BOARD_POLL_TIMEOUT = 30 # seconds a GET /board?wait=<seq> request waits for a change
 
 # Debug settings
 D_TIMINGS = False
@@ -1,5 +1,6 @@
 from machine import Pin
-from config import SCL, SDA
+import asyncio
+from config import SCL, SDA, DISPLAY_MAX_FPS
 from lcd_i2c import I2cLcd
 from machine import I2C
 from clock import Clock
@@ -34,19 +35,39 @@ class Display:
 	def show_splash(self, line1 = None, line2 = None):
 		self.display_mode = self.DISPLAY_MODE_SPLASH
 		if line1:
-			self.lcd.move_to(0, 0)
-			self.lcd.putstr(line1)
-			self.lcd.putstr(" " * (16 - len(line1)))
+			self.frame[0] = line1
 		if line2:
-			self.lcd.move_to(0, 1)
-			self.lcd.putstr(line2)
-			self.lcd.putstr(" " * (16 - len(line2)))
+			self.frame[1] = line2
+		self.render_event.set()
 
 	def __init__(self):
 		self.i2c = I2C(1, scl=Pin(SCL), sda=Pin(SDA))
 		self.lcd = I2cLcd(self.i2c, 0x27)
+		self.frame = ["", ""] # desired screen contents, drawn by the render task
+		self.render_event = asyncio.Event() # set when the frame changed
+		asyncio.create_task(self._render_loop())
 		self._print_menu()
+
+	async def _render_loop(self):
+		"""Draw the latest frame, at most DISPLAY_MAX_FPS times per second.
+
+		Callers only replace self.frame, so frames requested while one is being
+		drawn or during the frame interval are merged into the next one."""
+		interval = 1000 // DISPLAY_MAX_FPS
+		while True:
+			await self.render_event.wait()
+			self.render_event.clear()
+			for row, line in enumerate(self.frame):
+				self.lcd.move_to(0, row)
+				self.lcd.putstr(line)
+				self.lcd.putstr(" " * (16 - len(line)))
+			await self.lcd.flush_async()
+			await asyncio.sleep_ms(interval)
 			
+	def show_menu(self):
+		self.display_mode = self.DISPLAY_MODE_MENU
+		self._print_menu()
+
 	def menu_left(self):
 		self.menu_index -= 1
 		self.menu_index %= len(self.menu)
@@ -56,7 +77,7 @@ class Display:
 		if self.display_mode == self.DISPLAY_MODE_MENU: # Execute action
 			self.menu[self.menu_index][1]()
 		elif self.display_mode == self.DISPLAY_MODE_SPLASH: # Go back to menu
-			self.display_mode = self.DISPLAY_MODE_MENU
+			self.show_menu()
 
 	def menu_right(self):
 		self.menu_index += 1
@@ -65,8 +86,7 @@ class Display:
 
 	def _print_menu(self):
 		if len(self.menu) == 0:
-			self.lcd.clear()
-			return
-		self.lcd.clear()
-		self.lcd.move_to(0, 0)
-		self.lcd.putstr(self.menu[self.menu_index][0])
+			self.frame = ["", ""]
+		else:
+			self.frame = [self.menu[self.menu_index][0], ""]
+		self.render_event.set()
@@ -7,7 +7,20 @@ class Game:
 		self.clock = Clock()
 		self.clock.init_clock()
 		
-		self.clock.add_observer(lambda clock: self.drawLcd())
+		self.shown = False # the clock screen is only drawn while the game is on screen
+		self.clock.add_observer(self._clock_update)
+
+	def _clock_update(self, clock):
+		if self.shown:
+			self.drawLcd()
+
+	def enter(self):
+		"""Show the game screen and keep it updated; the clock keeps running while it is not shown."""
+		self.shown = True
+		self.drawLcd()
+
+	def leave(self):
+		self.shown = False
 
 	def drawLcd(self):
 		"""Observer method to update the display with the clock message."""
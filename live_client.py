@@ -0,0 +1,180 @@
+import asyncio
+from microdot.websocket import WebSocket
+from ring_buffer import RingBuffer
+from config import WS_QUEUE_LENGTH, WS_OVERFLOW_POLICY
+
+class Subscriber:
+	"""A spectator of the live board with its own bounded queue of encoded messages.
+
+	Queueing a message never waits on the network. When the queue overflows,
+	WS_OVERFLOW_POLICY decides what happens: 'resync' drops the backlog and sends
+	a full board instead, 'disconnect' closes the connection.
+
+	The client starts with a full board unless `backlog`, a list of encoded
+	messages with the deltas it missed since its last connection, is given.
+
+	Subclasses define PING, the encoded keep-alive message, and encode(), which
+	encodes a message for push().
+	"""
+	PING = None
+
+	def __init__(self, format, snapshot, backlog=None):
+		self.format = format # 'json', 'bin' or 'sse'
+		self.snapshot = snapshot # function returning the full board message for a format
+		self.queue = RingBuffer(WS_QUEUE_LENGTH)
+		self.needs_resync = backlog is None or len(backlog) > self.queue.capacity
+		self.closed = False
+		self.ping_queued = False # a ping is waiting in the queue
+		self.event = asyncio.Event()
+		if not self.needs_resync:
+			for frame in backlog:
+				self.queue.push(frame)
+		self.event.set()
+
+	def push(self, frame):
+		"""Queue an encoded message. Return True if it was queued."""
+		if self.closed:
+			return False
+		queued = len(self.queue) < self.queue.capacity
+		if queued:
+			self.queue.push(frame)
+		elif WS_OVERFLOW_POLICY == 'disconnect':
+			self.close()
+			return False
+		else:
+			self._clear()
+			self.needs_resync = True
+		self.event.set()
+		return queued
+
+	def _clear(self):
+		self.queue.clear()
+		self.ping_queued = False
+
+	def _pop(self):
+		frame = self.queue.pop()
+		if frame is self.PING:
+			self.ping_queued = False
+		return frame
+
+	def resync(self):
+		"""Replace the queued messages with a full board."""
+		self._clear()
+		self.needs_resync = True
+		self.event.set()
+
+	def close(self):
+		"""Stop sending and close the connection."""
+		self.closed = True
+		self.event.set()
+
+	def ping(self):
+		"""Queue the PING keep-alive message, unless the previous one is still queued."""
+		if not self.ping_queued and self.push(self.PING):
+			self.ping_queued = True
+
+	def unresponsive(self):
+		"""Return True if the last ping is still queued, so the connection stopped draining."""
+		return self.ping_queued
+
+	async def abort(self):
+		"""Close the connection at once (for clients that stopped responding)."""
+		self.close()
+
+
+class LiveClient(Subscriber):
+	"""A websocket spectator. Queued frames are written by a dedicated writer task."""
+	PING = WebSocket.encode_frame(b'', WebSocket.PING)
+
+	def __init__(self, ws, format, snapshot, backlog=None):
+		super().__init__(format, snapshot, backlog)
+		self.ws = ws
+		self.task = asyncio.create_task(self._writer())
+
+	@staticmethod
+	def encode(message):
+		return WebSocket.encode_frame(message)
+
+	def unresponsive(self):
+		# ws.awaiting_pong is set from the time the ping is written until the client answers
+		return self.ping_queued or self.ws.awaiting_pong
+
+	async def abort(self):
+		"""Close the connection at once, without the websocket closing handshake."""
+		self.close()
+		self.ws.closed = True # skips the close frame in the writer task
+		try:
+			await self.ws.request.sock[1].aclose()
+		except Exception:
+			pass
+
+	async def _writer(self):
+		ws = self.ws
+		try:
+			while not self.closed:
+				await self.event.wait()
+				self.event.clear()
+				if self.needs_resync:
+					# the snapshot supersedes everything queued so far
+					self.needs_resync = False
+					self._clear()
+					await ws.send(self.snapshot(self.format))
+				while self.queue and not self.closed:
+					frame = self._pop()
+					if frame is self.PING:
+						ws.awaiting_pong = True
+					await ws.send_frame(frame)
+		except Exception as e:
+			print(f"Error sending update: {e}")
+		self.closed = True
+		self._clear()
+		try:
+			# closing the stream also ends the handler waiting in ws.receive()
+			await ws.close()
+			await ws.request.sock[1].aclose()
+		except Exception:
+			pass
+
+
+class EventStreamClient(Subscriber):
+	"""A Server-Sent Events spectator, used as the async iterable body of the
+	streaming response; Microdot writes every event as soon as it is queued."""
+	PING = b': ping\n\n' # comment line, ignored by EventSource
+
+	def __init__(self, stream, snapshot, backlog=None, on_close=None):
+		super().__init__('sse', snapshot, backlog)
+		self.stream = stream # output stream of the connection
+		self.on_close = on_close # called with the client when the response ends
+
+	async def abort(self):
+		"""Close the connection at once; this also ends a write blocked on a dead peer."""
+		self.close()
+		try:
+			await self.stream.aclose()
+		except Exception:
+			pass
+
+	@staticmethod
+	def encode(message):
+		return message.encode()
+
+	def __aiter__(self):
+		return self
+
+	async def __anext__(self):
+		while not self.closed:
+			if self.needs_resync:
+				self.needs_resync = False
+				self._clear()
+				return self.encode(self.snapshot(self.format))
+			if self.queue:
+				return self._pop()
+			await self.event.wait()
+			self.event.clear()
+		raise StopAsyncIteration
+
+	async def aclose(self):
+		self.closed = True
+		self._clear()
+		if self.on_close:
+			self.on_close(self)
@@ -9,6 +9,13 @@ except OSError:
         with open('config.py', 'w') as config:
             config.write(default_config.read())
 
+# settings added by an update are missing from an existing config.py, use their defaults
+import config
+import default_config
+for name in dir(default_config):
+    if not name.startswith('_') and not hasattr(config, name):
+        setattr(config, name, getattr(default_config, name))
+
 import asyncio
 from app import App
 
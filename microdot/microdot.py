@@ -7,6 +7,7 @@ servers for MicroPython and standard Python.
 """
 import asyncio
 import io
+import os
 import re
 import time
 
@@ -649,37 +650,24 @@ class Response:
     async def write(self, stream):
         self.complete()
 
+        iter = self.body_iter()
         try:
-            # status code
-            reason = self.reason if self.reason is not None else \
-                ('OK' if self.status_code == 200 else 'N/A')
-            await stream.awrite('HTTP/1.0 {status_code} {reason}\r\n'.format(
-                status_code=self.status_code, reason=reason).encode())
-
-            # headers
-            for header, value in self.headers.items():
-                values = value if isinstance(value, list) else [value]
-                for value in values:
-                    await stream.awrite('{header}: {value}\r\n'.format(
-                        header=header, value=value).encode())
-            await stream.awrite(b'\r\n')
+            # status line and headers
+            head = self._encode_head()
+            if not self.is_head and isinstance(self.body, bytes) and \
+                    len(self.body) <= self.send_file_buffer_size:
+                # small bodies go out in the same write as the headers
+                head.extend(self.body)
+                await stream.awrite(head)
+                return
+            await stream.awrite(head)
 
             # body
             if not self.is_head:
-                iter = self.body_iter()
                 async for body in iter:
                     if isinstance(body, str):  # pragma: no cover
                         body = body.encode()
-                    try:
-                        await stream.awrite(body)
-                    except OSError as exc:  # pragma: no cover
-                        if exc.errno in MUTED_SOCKET_ERRORS or \
-                                exc.args[0] == 'Connection lost':
-                            if hasattr(iter, 'aclose'):
-                                await iter.aclose()
-                        raise
-                if hasattr(iter, 'aclose'):  # pragma: no branch
-                    await iter.aclose()
+                    await stream.awrite(body)
 
         except OSError as exc:  # pragma: no cover
             if exc.errno in MUTED_SOCKET_ERRORS or \
@@ -687,6 +675,27 @@ class Response:
                 pass
             else:
                 raise
+        finally:
+            # also when a write fails, whatever the error, so that streaming
+            # bodies can release their resources
+            if hasattr(iter, 'aclose'):  # pragma: no branch
+                await iter.aclose()
+
+    def _encode_head(self):
+        """Return the status line and headers, encoded into a single buffer
+        so that they can be sent with one write."""
+        reason = self.reason if self.reason is not None else \
+            ('OK' if self.status_code == 200 else 'N/A')
+        head = bytearray(b'HTTP/1.1 ')
+        head.extend('{status_code} {reason}\r\n'.format(
+            status_code=self.status_code, reason=reason).encode())
+        for header, value in self.headers.items():
+            values = value if isinstance(value, list) else [value]
+            for value in values:
+                head.extend('{header}: {value}\r\n'.format(
+                    header=header, value=value).encode())
+        head.extend(b'\r\n')
+        return head
 
     def body_iter(self):
         if hasattr(self.body, '__anext__'):
@@ -809,6 +818,13 @@ class Response:
             headers['Content-Encoding'] = compressed \
                 if isinstance(compressed, str) else 'gzip'
 
+        if stream is None:
+            try:
+                # a known length allows the connection to be kept alive
+                headers['Content-Length'] = str(
+                    os.stat(filename + file_extension)[6])
+            except OSError:  # pragma: no cover
+                pass
         f = stream or open(filename + file_extension, 'rb')
         return cls(body=f, status_code=status_code, headers=headers)
 
@@ -906,6 +922,29 @@ class Microdot:
         app = Microdot()
     """
 
+    #: Specify how long, in seconds, a persistent (keep-alive) connection
+    #: waits for the next request before it is closed. Set to 0 to close the
+    #: connection after every response.
+    #:
+    #: Example::
+    #:
+    #:    app.keep_alive_timeout = 10
+    keep_alive_timeout = 5
+
+    #: Specify the maximum number of requests that are served on a single
+    #: connection before it is closed.
+    #:
+    #: Example::
+    #:
+    #:    app.max_keep_alive_requests = 100
+    max_keep_alive_requests = 10
+
+    #: The response sent to requests rejected by the
+    #: :attr:`admission_handler`, after which the connection is closed. It is
+    #: sent as is, so it must be a complete HTTP response.
+    overload_response = b'HTTP/1.1 503 Service Unavailable\r\n' \
+        b'Retry-After: 5\r\nContent-Length: 0\r\nConnection: close\r\n\r\n'
+
     def __init__(self):
         self.url_map = []
         self.before_request_handlers = []
@@ -914,8 +953,19 @@ class Microdot:
         self.error_handlers = {}
         self.shutdown_requested = False
         self.options_handler = self.default_options_handler
+        #: A function called with each request once its headers are read. If
+        #: it returns a falsy value, the request is answered with
+        #: :attr:`overload_response` and the connection closed, without
+        #: dispatching the request. Connections idle between keep-alive
+        #: requests are not checked. Set to ``None`` (the default) to accept
+        #: all requests.
+        self.admission_handler = None
+        #: The number of requests being dispatched or answered, not counting
+        #: the one checked by the :attr:`admission_handler`.
+        self.active_requests = 0
         self.debug = False
         self.server = None
+        self._route_index = None
 
     def route(self, url_pattern, methods=None):
         """Decorator that is used to register a function as a request handler
@@ -951,6 +1001,7 @@ class Microdot:
             self.url_map.append(
                 ([m.upper() for m in (methods or ['GET'])],
                  URLPattern(url_pattern), f, '', None))
+            self._route_index = None
             return f
         return decorated
 
@@ -1132,6 +1183,7 @@ class Microdot:
             self.url_map.append(
                 (methods, URLPattern(url_prefix + pattern.url_pattern),
                  handler, url_prefix + _prefix, _subapp or subapp))
+        self._route_index = None
         if not local:
             for handler in subapp.before_request_handlers:
                 self.before_request_handlers.append(handler)
@@ -1299,6 +1351,56 @@ class Microdot:
         """
         self.server.close()
 
+    def _build_route_index(self):
+        """Index the URL map by path.
+
+        Routes without dynamic components are stored in a dictionary by their
+        exact path. The remaining routes are stored in a prefix tree under the
+        static path segments that precede their first dynamic component, so
+        that only routes that can possibly match a path need their regular
+        expression evaluated. Routes are referenced by their position in
+        ``url_map`` so that the original matching order is preserved.
+        """
+        def is_literal(segment):
+            return segment[:1] != '<' and \
+                not any(c in segment for c in '.^$*+?{}[]\\|()')
+
+        exact = {}
+        tree = {}
+        for position, (_, route_pattern, _, _, _) in enumerate(self.url_map):
+            url_pattern = route_pattern.url_pattern
+            segments = url_pattern.lstrip('/').split('/')
+            if all(is_literal(segment) for segment in segments):
+                path = '/' + url_pattern.lstrip('/')
+                exact.setdefault(path, []).append(position)
+                continue
+            node = tree
+            for segment in segments:
+                if not is_literal(segment):
+                    break
+                node = node.setdefault(segment, {})
+            node.setdefault(None, []).append(position)
+        self._route_index = (len(self.url_map), exact, tree)
+
+    def _route_candidates(self, path):
+        """Return the positions in ``url_map`` of the routes that can match
+        the given path, in order, and those that match it exactly."""
+        if self._route_index is None or \
+                self._route_index[0] != len(self.url_map):
+            self._build_route_index()
+        _, exact, tree = self._route_index
+        exact_matches = exact.get(path, [])
+        candidates = list(exact_matches)
+        node = tree
+        candidates.extend(node.get(None, []))
+        for segment in path.lstrip('/').split('/'):
+            node = node.get(segment)
+            if node is None:
+                break
+            candidates.extend(node.get(None, []))
+        candidates.sort()
+        return candidates, exact_matches
+
     def find_route(self, req):
         method = req.method.upper()
         if method == 'OPTIONS' and self.options_handler:
@@ -1308,9 +1410,13 @@ class Microdot:
         f = 404
         p = ''
         s = None
-        for route_methods, route_pattern, route_handler, url_prefix, subapp \
-                in self.url_map:
-            req.url_args = route_pattern.match(req.path)
+        req.url_args = None
+        candidates, exact_matches = self._route_candidates(req.path)
+        for position in candidates:
+            route_methods, route_pattern, route_handler, url_prefix, subapp = \
+                self.url_map[position]
+            req.url_args = {} if position in exact_matches \
+                else route_pattern.match(req.path)
             if req.url_args is not None:
                 p = url_prefix
                 s = subapp
@@ -1331,28 +1437,89 @@ class Microdot:
         allow.append('OPTIONS')
         return {'Allow': ', '.join(allow)}
 
+    def keep_alive(self, req, res, requests):
+        """Return ``True`` if the connection can be reused for another request
+        after sending the given response.
+
+        :param req: the request object, or ``None`` if it could not be parsed.
+        :param res: the response object.
+        :param requests: the number of requests served on the connection so
+                         far, including this one.
+        """
+        if not req or not self.keep_alive_timeout or \
+                requests >= self.max_keep_alive_requests:
+            return False
+        connection = req.headers.get('Connection', '').lower()
+        if connection == 'close' or (req.http_version == '1.0' and
+                                     connection != 'keep-alive'):
+            return False
+        if len(req.body or b'') != req.content_length:
+            # the request body was not read, so the next request cannot be
+            return False
+        # the client can only find the end of the response from its length
+        return isinstance(res.body, bytes) or 'Content-Length' in res.headers
+
     async def handle_request(self, reader, writer):
-        req = None
-        try:
-            req = await Request.create(self, reader, writer,
-                                       writer.get_extra_info('peername'))
-        except Exception as exc:  # pragma: no cover
-            print_exception(exc)
+        requests = 0
+        while True:
+            req = None
+            try:
+                if requests == 0:
+                    req = await Request.create(
+                        self, reader, writer,
+                        writer.get_extra_info('peername'))
+                else:
+                    # wait for the next request on a persistent connection
+                    req = await asyncio.wait_for(Request.create(
+                        self, reader, writer,
+                        writer.get_extra_info('peername')),
+                        self.keep_alive_timeout)
+                    if req is None:
+                        break  # the client closed the connection
+            except (OSError, asyncio.TimeoutError) as exc:
+                if requests:
+                    break
+                print_exception(exc)  # pragma: no cover
+            except Exception as exc:  # pragma: no cover
+                print_exception(exc)
 
-        res = await self.dispatch_request(req)
+            if req and self.admission_handler is not None and \
+                    not self.admission_handler(req):
+                try:
+                    await writer.awrite(self.overload_response)
+                except OSError:  # pragma: no cover
+                    pass
+                break
+            self.active_requests += 1
+            try:
+                res = await self.dispatch_request(req)
+                requests += 1
+                keep_alive = res != Response.already_handled and \
+                    self.keep_alive(req, res, requests)
+                try:
+                    if res != Response.already_handled:  # pragma: no branch
+                        res.headers['Connection'] = \
+                            'keep-alive' if keep_alive else 'close'
+                        await res.write(writer)
+                except OSError as exc:  # pragma: no cover
+                    keep_alive = False
+                    if exc.errno not in MUTED_SOCKET_ERRORS:
+                        raise
+                if self.debug and req:  # pragma: no cover
+                    print('{method} {path} {status_code}'.format(
+                        method=req.method, path=req.path,
+                        status_code=res.status_code))
+            finally:
+                self.active_requests -= 1
+            if not keep_alive:
+                break
         try:
-            if res != Response.already_handled:  # pragma: no branch
-                await res.write(writer)
             await writer.aclose()
         except OSError as exc:  # pragma: no cover
             if exc.errno in MUTED_SOCKET_ERRORS:
                 pass
             else:
                 raise
-        if self.debug and req:  # pragma: no cover
-            print('{method} {path} {status_code}'.format(
-                method=req.method, path=req.path,
-                status_code=res.status_code))
 
     def get_request_handlers(self, req, attr, local_first=True):
         handlers = getattr(self, attr + '_handlers')
@@ -1,9 +1,28 @@
+import asyncio
 import binascii
 import hashlib
 from microdot import Request, Response
 from microdot.microdot import MUTED_SOCKET_ERRORS, print_exception
 from microdot.helpers import wraps
 
+try:
+    import micropython
+
+    @micropython.viper
+    def _unmask(payload, mask, length: int):  # pragma: no cover
+        """Unmask a websocket payload in place."""
+        p = ptr8(payload)  # noqa: F821
+        m = ptr8(mask)  # noqa: F821
+        for i in range(length):
+            p[i] ^= m[i & 3]
+except ImportError:
+    def _unmask(payload, mask, length):
+        """Unmask a websocket payload in place."""
+        # XOR the whole payload at once, as a single large integer
+        key = (mask * (length // 4 + 1))[:length]
+        payload[:] = (int.from_bytes(payload, 'big') ^
+                      int.from_bytes(key, 'big')).to_bytes(length, 'big')
+
 
 class WebSocketError(Exception):
     """Exception raised when an error occurs in a WebSocket connection."""
@@ -35,17 +54,29 @@ class WebSocket:
     #:    WebSocket.max_message_length = 4 * 1024  # up to 4KB messages
     max_message_length = -1
 
+    #: Size of the scratch buffer each connection uses to send frames.
+    #: Frames that fit in it (header included) are sent with a single write,
+    #: larger frames are sent as the header followed by the payload itself,
+    #: without copying it.
+    send_buffer_size = 128
+
     def __init__(self, request):
         self.request = request
         self.closed = False
+        #: Set by the application when it sends a ping, cleared by
+        #: :meth:`receive` when the client answers it with a pong.
+        self.awaiting_pong = False
+        self._send_buffer = bytearray(self.send_buffer_size)
+        # a frame can take more than one write, so frames sent from different
+        # tasks (such as the pong sent by receive()) must not interleave
+        self._send_lock = asyncio.Lock()
 
     async def handshake(self):
         response = self._handshake_response()
         await self.request.sock[1].awrite(
-            b'HTTP/1.1 101 Switching Protocols\r\n')
-        await self.request.sock[1].awrite(b'Upgrade: websocket\r\n')
-        await self.request.sock[1].awrite(b'Connection: Upgrade\r\n')
-        await self.request.sock[1].awrite(
+            b'HTTP/1.1 101 Switching Protocols\r\n'
+            b'Upgrade: websocket\r\n'
+            b'Connection: Upgrade\r\n'
             b'Sec-WebSocket-Accept: ' + response + b'\r\n\r\n')
 
     async def receive(self):
@@ -66,10 +97,30 @@ class WebSocket:
                        is ``TEXT`` or ``BINARY`` depending on the type of the
                        data.
         """
-        frame = self._encode_websocket_frame(
-            opcode or (self.TEXT if isinstance(data, str) else self.BINARY),
-            data)
-        await self.request.sock[1].awrite(frame)
+        if isinstance(data, str):
+            opcode = opcode or self.TEXT
+            data = data.encode()
+        else:
+            opcode = opcode or self.BINARY
+        length = len(data)
+        buffer = self._send_buffer
+        stream = self.request.sock[1]
+        async with self._send_lock:
+            n = self._encode_frame_header(buffer, opcode, length)
+            if n + length <= len(buffer):
+                buffer[n:n + length] = data
+                await stream.awrite(memoryview(buffer)[:n + length])
+            else:
+                await stream.awrite(memoryview(buffer)[:n])
+                await stream.awrite(memoryview(data))
+
+    async def send_frame(self, frame):
+        """Send a frame previously encoded with :meth:`encode_frame`.
+
+        :param frame: the encoded frame, as returned by ``encode_frame()``.
+        """
+        async with self._send_lock:
+            await self.request.sock[1].awrite(frame)
 
     async def close(self):
         """Close the websocket connection."""
@@ -123,9 +174,43 @@ class WebSocket:
         elif opcode == self.PING:
             return self.PONG, payload
         elif opcode == self.PONG:  # pragma: no branch
+            self.awaiting_pong = False
             return None, None
         return None, payload
 
+    @staticmethod
+    def _encode_frame_header(buffer, opcode, length):
+        """Write the header of a frame into the given buffer, which must be at
+        least 10 bytes long, and return the length of the header."""
+        buffer[0] = 0x80 | opcode
+        if length < 126:
+            buffer[1] = length
+            return 2
+        elif length < (1 << 16):
+            buffer[1] = 126
+            buffer[2:4] = length.to_bytes(2, 'big')
+            return 4
+        buffer[1] = 127
+        buffer[2:10] = length.to_bytes(8, 'big')
+        return 10
+
+    @classmethod
+    def encode_frame(cls, data, opcode=None):
+        """Encode a message as a complete websocket frame.
+
+        The returned frame is immutable and can be sent to any number of
+        connections with :meth:`send_frame`, so that a message sent to many
+        clients is only encoded once.
+
+        :param data: the data to send, given as a string or bytes.
+        :param opcode: a custom frame opcode to use. If not given, the opcode
+                       is ``TEXT`` or ``BINARY`` depending on the type of the
+                       data.
+        """
+        return bytes(cls._encode_websocket_frame(
+            opcode or (cls.TEXT if isinstance(data, str) else cls.BINARY),
+            data))
+
     @classmethod
     def _encode_websocket_frame(cls, opcode, payload):
         frame = bytearray()
@@ -162,7 +247,8 @@ class WebSocket:
             mask = await self.request.sock[0].read(4)
         payload = await self.request.sock[0].read(length)
         if has_mask:  # pragma: no cover
-            payload = bytes(x ^ mask[i % 4] for i, x in enumerate(payload))
+            payload = bytearray(payload)
+            _unmask(payload, mask, len(payload))
         return opcode, payload
 
 
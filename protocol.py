@@ -0,0 +1,53 @@
+from board_state import BoardState
+
+# Binary websocket protocol (`/live?format=bin`). Every frame starts with the
+# message type and a 16-bit big-endian sequence number:
+# - FULL_BOARD: 57 bytes of 2-bit stone codes, cell i = x * 15 + y is stored in
+#   byte i >> 2 at bit offset (i & 3) * 2
+# - STONE_UPDATES: 2 bytes per changed cell, the cell index and its stone code
+FULL_BOARD = 1
+STONE_UPDATES = 2
+
+BOARD_BYTES = (BoardState.CELLS + 3) // 4
+
+def _header(message_type, seq, length):
+	frame = bytearray(3 + length)
+	frame[0] = message_type
+	frame[1] = (seq >> 8) & 0xff
+	frame[2] = seq & 0xff
+	return frame
+
+def pack_board(stones, seq):
+	"""Encode BoardState.stones as a FULL_BOARD frame."""
+	frame = _header(FULL_BOARD, seq, BOARD_BYTES)
+	for i in range(BoardState.CELLS):
+		frame[3 + (i >> 2)] |= stones[i] << ((i & 3) << 1)
+	return frame
+
+def pack_updates(changes, seq):
+	"""Encode a list of (cell index, stone code) pairs as a STONE_UPDATES frame."""
+	frame = _header(STONE_UPDATES, seq, 2 * len(changes))
+	offset = 3
+	for index, stone in changes:
+		frame[offset] = index
+		frame[offset + 1] = stone
+		offset += 2
+	return frame
+
+def unpack_updates(frame):
+	"""Decode a STONE_UPDATES frame into its sequence number and (cell index, stone code) pairs."""
+	return (frame[1] << 8) | frame[2], [(frame[i], frame[i + 1]) for i in range(3, len(frame), 2)]
+
+def merge_updates(frames):
+	"""Merge STONE_UPDATES frames, oldest first, into one with the last code of
+	every cell and the sequence number of the last frame."""
+	stones = {}
+	for frame in frames:
+		seq, changes = unpack_updates(frame)
+		for index, stone in changes:
+			stones[index] = stone
+	return pack_updates(list(stones.items()), seq)
+
+def sse_event(seq, data):
+	"""Format a text message as a Server-Sent Event with the sequence number as id."""
+	return 'id: {}\ndata: {}\n\n'.format(seq, data)
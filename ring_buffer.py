@@ -0,0 +1,47 @@
+class RingBuffer:
+	"""Fixed-capacity FIFO queue backed by a preallocated list.
+
+	Pushing and popping are O(1) and do not allocate. Pushing into a full buffer
+	drops the oldest item, which is counted in `dropped`.
+	"""
+	def __init__(self, capacity):
+		self.items = [None] * capacity
+		self.capacity = capacity
+		self.start = 0 # position of the oldest item
+		self.length = 0
+		self.dropped = 0
+
+	def __len__(self):
+		return self.length
+
+	def __getitem__(self, index):
+		"""Return the item at the given position, 0 being the oldest."""
+		if index < 0:
+			index += self.length
+		if not 0 <= index < self.length:
+			raise IndexError('ring buffer index out of range')
+		return self.items[(self.start + index) % self.capacity]
+
+	def push(self, item):
+		"""Append an item, dropping the oldest one if the buffer is full."""
+		if self.length == self.capacity:
+			self.items[self.start] = item
+			self.start = (self.start + 1) % self.capacity
+			self.dropped += 1
+			return
+		self.items[(self.start + self.length) % self.capacity] = item
+		self.length += 1
+
+	def pop(self):
+		"""Remove and return the oldest item."""
+		if not self.length:
+			raise IndexError('pop from empty ring buffer')
+		item = self.items[self.start]
+		self.items[self.start] = None
+		self.start = (self.start + 1) % self.capacity
+		self.length -= 1
+		return item
+
+	def clear(self):
+		while self.length:
+			self.pop()
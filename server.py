@@ -1,17 +1,42 @@
-from microdot import Microdot, send_file, Request, websocket
-from microdot.websocket import with_websocket
+from microdot import Microdot, Response, send_file, Request, websocket, abort
+from microdot.websocket import websocket_wrapper, websocket_upgrade, WebSocket
+import asyncio
+import gc
 import json
+import random
 from board import Board
+from board_state import BoardState, STONE_CHARS
+import protocol
+from live_client import LiveClient, EventStreamClient
+from ring_buffer import RingBuffer
+from static_cache import StaticCache
 from machine import soft_reset
-from config import PORT
+from config import PORT, WS_FLUSH_INTERVAL, WS_HISTORY_LENGTH, HTTP_KEEP_ALIVE_TIMEOUT, HTTP_MAX_KEEP_ALIVE_REQUESTS
+from config import WS_PING_INTERVAL, WS_PONG_TIMEOUT, MAX_WS_CLIENTS, MAX_HTTP_REQUESTS, MIN_FREE_MEMORY
+from config import BOARD_POLL_TIMEOUT
 
 class Server:
 	def __init__(self, board: Board):
 		self.board = board
 		self.app = Microdot()
-		self.websockets = set()
+		self.app.keep_alive_timeout = HTTP_KEEP_ALIVE_TIMEOUT
+		self.app.max_keep_alive_requests = HTTP_MAX_KEEP_ALIVE_REQUESTS
+		self.app.admission_handler = self._admit
+		self.clients = set() # LiveClient of every open websocket, EventStreamClient of every event stream
+		self.reaped_clients = 0 # clients disconnected for not answering pings
+		self.static = StaticCache()
+		# Sequence number of the last delta message, 16 bits. It starts at a random value
+		# so that clients resuming after a reboot of the board get a full board.
+		self.seq = random.getrandbits(16)
+		self.history = RingBuffer(WS_HISTORY_LENGTH) # STONE_UPDATES frames of the last deltas, 2 bytes per changed cell
+		self.pending_changes = {} # (x, y) -> stone, waiting for the next delta message
+		self.changes_event = asyncio.Event()
+		self.board_event = asyncio.Event() # set and replaced whenever seq changes
+		self.board_waiters = 0 # GET /board?wait= requests waiting for a change
 		
-		self.app.route('/live')(with_websocket(self.ws_handler))
+		self.app.route('/live')(websocket_wrapper(self.ws_handler, self._websocket_upgrade))
+		self.app.route('/events')(self.events_handler)
+		self.app.route('/board')(self.board_handler)
 		self.app.route('/config', methods=['GET'])(self.get_settings_handler)
 		self.app.route('/configDefault', methods=['GET'])(self.get_default_settings_handler)
 		self.app.route('/config', methods=['POST'])(self.post_settings_handler)
@@ -21,10 +46,121 @@ class Server:
 		
 
 	async def start(self):
+		asyncio.create_task(self._flush_loop())
+		asyncio.create_task(self._heartbeat_loop())
 		await self.app.start_server(port=PORT)
 
+	async def _heartbeat_loop(self):
+		"""Ping all clients every WS_PING_INTERVAL seconds and disconnect those that
+		do not answer within WS_PONG_TIMEOUT seconds."""
+		while True:
+			await asyncio.sleep(WS_PING_INTERVAL)
+			pinged = list(self.clients)
+			for client in pinged:
+				client.ping()
+			await asyncio.sleep(WS_PONG_TIMEOUT)
+			for client in pinged:
+				if client.unresponsive() and client in self.clients:
+					self.clients.discard(client)
+					self.reaped_clients += 1
+					await client.abort()
+
+	def queue_changes(self, changes):
+		"""Queue (x, y, previous_stone, new_stone) changes for the next delta message to all clients."""
+		for x, y, previous_stone, new_stone in changes:
+			self.pending_changes[(x, y)] = new_stone
+		self.changes_event.set()
+
+	async def _flush_loop(self):
+		"""Send queued changes as one message, at most once every WS_FLUSH_INTERVAL ms."""
+		while True:
+			await self.changes_event.wait()
+			self.changes_event.clear()
+			self.seq = (self.seq + 1) & 0xffff
+			delta = protocol.pack_updates(
+				[(BoardState.index(x, y), STONE_CHARS.index(stone)) for (x, y), stone in self.pending_changes.items()],
+				self.seq)
+			self.pending_changes = {}
+			self.history.push(delta)
+			board_event, self.board_event = self.board_event, asyncio.Event()
+			board_event.set() # wakes the long-polling requests
+			formats = [client.format for client in self.clients]
+			for format in ('json', 'bin', 'sse'):
+				if format in formats:
+					self.send_to_all(self.delta_message(delta, format), format)
+			await asyncio.sleep_ms(WS_FLUSH_INTERVAL)
+
+	def delta_message(self, delta, format):
+		"""Return a delta from the history (a STONE_UPDATES frame) as a message in the given format."""
+		if format == 'bin':
+			return delta
+		seq, changes = protocol.unpack_updates(delta)
+		message = json.dumps({
+			'type': 'stone_updates',
+			'seq': seq,
+			'stones': [[index // BoardState.SIZE, index % BoardState.SIZE, STONE_CHARS[stone]] for index, stone in changes],
+		})
+		return protocol.sse_event(seq, message) if format == 'sse' else message
+
+	def missed_deltas(self, since):
+		"""Return the deltas after sequence number `since`, or None if
+		they are no longer in the history and the client needs the full board."""
+		missed = (self.seq - since) & 0xffff
+		if missed > len(self.history):
+			return None
+		return [self.history[i] for i in range(len(self.history) - missed, len(self.history))]
+
+	def full_board_message(self, format):
+		"""Return the current board as a message in the given format."""
+		if format == 'bin':
+			return protocol.pack_board(self.board.state.stones, self.seq)
+		message = json.dumps({
+			'type': 'full_board',
+			'seq': self.seq,
+			'board': self.board.stone_matrix,
+		})
+		return protocol.sse_event(self.seq, message) if format == 'sse' else message
+
+	def _memory_available(self):
+		"""Check that at least MIN_FREE_MEMORY bytes of heap are free, collecting garbage if needed."""
+		if gc.mem_free() >= MIN_FREE_MEMORY:
+			return True
+		gc.collect()
+		return gc.mem_free() >= MIN_FREE_MEMORY
+
+	def _admit(self, request: Request):
+		"""Admission handler of requests; rejected ones get a bare 503 response."""
+		if request.path in ('/live', '/events'):
+			return True # limited by MAX_WS_CLIENTS in their handlers
+		# live clients and long-polls are counted separately
+		http_requests = self.app.active_requests - len(self.clients) - self.board_waiters
+		return http_requests < MAX_HTTP_REQUESTS and self._memory_available()
+
+	def _check_live_capacity(self):
+		if len(self.clients) + self.board_waiters >= MAX_WS_CLIENTS or not self._memory_available():
+			abort(503, 'Too many live clients')
+
+	async def _websocket_upgrade(self, request: Request):
+		self._check_live_capacity()
+		return await websocket_upgrade(request)
+
+	def _backlog(self, since, encode, format):
+		"""Return the encoded messages a client resuming after sequence number `since`
+		(a string, from the client) missed, or None if it needs the full board.
+
+		The missed deltas are merged into a single message, so that any delta in
+		the history can be resumed from, whatever the client queue length."""
+		if since is None or not since.isdigit():
+			return None
+		deltas = self.missed_deltas(int(since))
+		if deltas is None:
+			return None
+		if not deltas:
+			return []
+		return [encode(self.delta_message(protocol.merge_updates(deltas), format))]
+
 	async def index_handler(self, request: Request):
-		return send_file('static/index.html', content_type='text/html')
+		return self.static.response(request, 'static/index.html', 'text/html')
 
 	async def static_handler(self, request: Request, path: str):
 		# get content type
@@ -38,14 +174,8 @@ class Server:
 			content_type = 'image/png'
 		else:
 			content_type = 'text/plain'
-		# check if file exists
-		try:
-			with open(f'static/{path}', 'rb') as f:
-				pass
-		except OSError:
-			return "File not found", 404
-		# send file
-		return send_file(f'static/{path}', content_type=content_type)
+		# send file, from RAM if cached
+		return self.static.response(request, f'static/{path}', content_type)
 	
 	async def get_settings_handler(self, request: Request):
 		return send_file('config.py', content_type='text/plain')
@@ -67,23 +197,66 @@ class Server:
 
 	
 	async def ws_handler(self, request: Request, ws: websocket.WebSocket):
-		self.websockets.add(ws)
-		await ws.send(json.dumps({
-			'type': 'full_board',
-			'board': self.board.stone_matrix,
-		}))
-		while True:
-			# recieve and send loop; aditional messages can be sent outside this loop
-			if ws.closed:
-				self.websockets.remove(ws)
-				break
-			message = await ws.receive()
-			await ws.send(message)
-
-	async def send_to_all(self, message):
-		for ws in self.websockets:
-			if not ws.closed:
-				try:
-					await ws.send(message)
-				except Exception as e:
-					print(f"Error sending update: {e}")
+		format = 'bin' if request.args.get('format') == 'bin' else 'json'
+		# A reconnecting client sends the last sequence number it has seen and only
+		# gets the deltas it missed; everyone else starts with the full board.
+		backlog = self._backlog(request.args.get('since'), LiveClient.encode, format)
+		client = LiveClient(ws, format, self.full_board_message, backlog)
+		self.clients.add(client)
+		try:
+			while True:
+				# recieve and send loop; aditional messages can be sent outside this loop
+				if ws.closed or client.closed:
+					break
+				message = await ws.receive()
+				client.push(WebSocket.encode_frame(message))
+		finally:
+			self.clients.discard(client)
+			client.close()
+
+	async def events_handler(self, request: Request):
+		"""Server-Sent Events feed of the board: the full_board and stone_updates JSON
+		messages of `/live`, one per event, with the sequence number as event id."""
+		headers = {'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'}
+		if request.method == 'HEAD':
+			return Response(headers=headers)
+		self._check_live_capacity()
+		# EventSource sends the id of the last event it got when it reconnects
+		since = request.headers.get('Last-Event-ID', request.args.get('since'))
+		backlog = self._backlog(since, EventStreamClient.encode, 'sse')
+		client = EventStreamClient(request.sock[1], self.full_board_message, backlog, on_close=self.clients.discard)
+		self.clients.add(client)
+		return Response(client, headers=headers)
+
+	async def board_handler(self, request: Request):
+		"""Snapshot of the board with the sequence number of the last delta as ETag.
+
+		With `?wait=<seq>`, a request for the current sequence number waits up to
+		BOARD_POLL_TIMEOUT seconds for the board to change before answering."""
+		wait = request.args.get('wait')
+		if wait is not None and wait.isdigit() and int(wait) == self.seq:
+			self._check_live_capacity()
+			self.board_waiters += 1
+			try:
+				await asyncio.wait_for(self.board_event.wait(), BOARD_POLL_TIMEOUT)
+			except asyncio.TimeoutError:
+				pass
+			finally:
+				self.board_waiters -= 1
+		etag = '"{}"'.format(self.seq)
+		headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+		if_none_match = request.headers.get('If-None-Match')
+		if if_none_match and (if_none_match == '*' or etag in if_none_match):
+			return Response(status_code=304, headers=headers, reason='Not Modified')
+		return {'seq': self.seq, 'board': self.board.stone_matrix}, headers
+
+	def send_to_all(self, message, format='json'):
+		"""Queue a message for all clients using the given format, encoding it only once.
+
+		Never waits on the network; each client's writer task or stream sends it."""
+		frame = None
+		for client in self.clients:
+			if client.format == format:
+				if frame is None:
+					frame = client.encode(message)
+				client.push(frame)
@@ -0,0 +1,80 @@
+import binascii
+import hashlib
+from os import stat
+from microdot import Response, send_file
+from config import STATIC_CACHE_SIZE
+
+class StaticCache:
+	"""Serve static files with strong ETags, answering If-None-Match with 304.
+
+	Every file is read from flash once to compute its ETag. Files that fit in the
+	STATIC_CACHE_SIZE byte budget are kept in RAM and served from there, larger
+	ones are streamed from flash. If `<file>.gz` exists and the client accepts
+	gzip, the pre-compressed file is served instead.
+	"""
+	def __init__(self, max_bytes=STATIC_CACHE_SIZE):
+		self.max_bytes = max_bytes
+		self.cached_bytes = 0
+		self.entries = {} # filename -> (etag, body or None if not kept in RAM)
+		self.uncompressed = set() # existing files known to have no .gz copy
+
+	def _load(self, filename):
+		"""Return the (etag, body) entry of a file, or None if it does not exist."""
+		entry = self.entries.get(filename)
+		if entry is not None:
+			return entry
+		try:
+			size = stat(filename)[6]
+			f = open(filename, 'rb')
+		except OSError:
+			return None
+
+		keep = self.cached_bytes + size <= self.max_bytes
+		body = bytearray() if keep else None
+		digest = hashlib.sha1()
+		with f:
+			while True:
+				chunk = f.read(Response.send_file_buffer_size)
+				if not chunk:
+					break
+				digest.update(chunk)
+				if keep:
+					body.extend(chunk)
+		if keep:
+			body = bytes(body)
+			self.cached_bytes += len(body)
+		entry = ('"' + binascii.hexlify(digest.digest()[:8]).decode() + '"', body)
+		self.entries[filename] = entry
+		return entry
+
+	def response(self, request, filename, content_type):
+		"""Return the response for a request of the given file."""
+		compressed = False
+		entry = None
+		gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+		if gzip and filename not in self.uncompressed:
+			entry = self._load(filename + '.gz')
+			compressed = entry is not None
+		if entry is None:
+			entry = self._load(filename)
+			if entry is None:
+				# misses are not remembered, so requests for random paths cannot fill the heap
+				return "File not found", 404
+			if gzip:
+				self.uncompressed.add(filename)
+
+		etag, body = entry
+		headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+		if_none_match = request.headers.get('If-None-Match')
+		if if_none_match and (if_none_match == '*' or etag in if_none_match):
+			return Response(status_code=304, headers=headers, reason='Not Modified')
+
+		if body is None:
+			response = send_file(filename, content_type=content_type, compressed=compressed,
+				file_extension='.gz' if compressed else '')
+			response.headers.update(headers)
+			return response
+		headers['Content-Type'] = content_type
+		if compressed:
+			headers['Content-Encoding'] = 'gzip'
+		return Response(body, headers=headers)
@@ -0,0 +1,50 @@
+class TimeControl:
+	"""Time control of one player, all times in milliseconds.
+
+	The player has `main_time`, then `periods` byo-yomi periods of `period_time`
+	each: a period is only used up when a move takes longer than a whole period.
+	Each move made in main time adds a Fischer `increment`, and gives back the
+	time it used up to `delay` ms (Bronstein delay). The clock runs from the start
+	of the move either way, so the flag can fall during the delay.
+
+	Remaining time is always computed from the time left at the start of the
+	turn and the time elapsed since then, never by accumulating deltas.
+	"""
+	def __init__(self, main_time, increment = 0, delay = 0, periods = 0, period_time = 0):
+		self.main = main_time # main time left at the start of the turn
+		self.periods = periods # byo-yomi periods left at the start of the turn
+		self.increment = increment
+		self.delay = delay
+		self.period_time = period_time
+
+	def state(self, elapsed):
+		"""Return (main time left, periods left, time left in the current period)
+		after `elapsed` ms of the turn. Periods left is -1 once the flag fell."""
+		if elapsed < self.main:
+			return self.main - elapsed, self.periods, self.period_time
+		overflow = elapsed - self.main
+		used = overflow // self.period_time if self.period_time else self.periods
+		if used >= self.periods:
+			return 0, -1, 0
+		return 0, self.periods - used, self.period_time - overflow % self.period_time
+
+	def time_left(self, elapsed):
+		"""Return the time shown on the clock: main time, or the time left in the current period."""
+		main, periods, period_left = self.state(elapsed)
+		return main if main > 0 else period_left
+
+	def flagged(self, elapsed):
+		return self.state(elapsed)[1] < 0
+
+	def next_wakeup(self, elapsed):
+		"""Return the ms until the shown seconds change, main time or a period runs
+		out, or the flag falls."""
+		left = self.time_left(elapsed)
+		return min(left % 1000 + 1, left)
+
+	def end_turn(self, elapsed, moved = True):
+		"""Charge the `elapsed` ms of the turn and start the next one; a move in main
+		time adds the increment and gives back the delay."""
+		self.main, self.periods, period_left = self.state(elapsed)
+		if moved and self.main > 0:
+			self.main += self.increment + min(self.delay, elapsed)